@@ -15,40 +15,82 @@ Features
 
 Quick Start
 1) python3 -m venv .venv && source .venv/bin/activate
-2) pip install flask==3.0.0 werkzeug==3.0.1
+2) pip install flask==3.0.0 werkzeug==3.0.1 gunicorn==21.2.0
 3) export FLASK_SECRET="change-me" ; export ADMIN_PASSWORD="changeme"
 4) python halloween_voting_app.py
+   (execs: gunicorn -w 4 -k gthread --threads 8 -b 0.0.0.0:5000 halloween_voting_app:app;
+    set FLASK_DEBUG=1, or leave gunicorn uninstalled, for Flask's single-process dev server)
 5) Browse http://127.0.0.1:5000
 
 Notes
 - Uploaded photos saved under ./uploads (created automatically)
 - Max photo size 5 MB; allowed extensions: jpg, jpeg, png, gif
+- Behind nginx, set UPLOADS_ACCEL_PREFIX to an internal location serving the uploads dir, e.g.
+  `location /_uploads/ { internal; alias /uploads/; }` with UPLOADS_ACCEL_PREFIX=/_uploads/
+- Behind Apache (mod_xsendfile) or lighttpd, set USE_X_SENDFILE=1 instead
+- Behind any reverse proxy, set TRUSTED_PROXIES to the number of proxy hops so the
+  login throttle sees client addresses from X-Forwarded-For, not the proxy's
 - Default categories seeded: Most Realistic Costume, Funniest Costume, Scariest Costume, Best Homemade Costume, Least Effort Costume, Classic Halloween Costume, Cutest Costume
 - To reset database manually: stop the app and delete halloween.db and uploads/*
 """
 from __future__ import annotations
 
+import base64
+import csv
 import datetime as dt
+import gzip
+import hashlib
+import hmac
+import importlib.metadata
+import io
+import mimetypes
 import os
+import re
 import secrets
+import shutil
 import sqlite3
+import stat
+import tempfile
+import threading
+import time
+import zlib
+from collections import namedtuple
+from contextlib import closing
+from functools import lru_cache
+from itertools import groupby
 from pathlib import Path
+from types import SimpleNamespace
 from typing import Optional
+from urllib.parse import quote
 
 from flask import (
     Flask,
+    Request,
     Response,
     abort,
     flash,
+    g,
+    get_flashed_messages,
     redirect,
-    render_template_string,
     request,
     send_from_directory,
     session,
+    stream_with_context,
     url_for,
 )
+from jinja2 import DictLoader, FileSystemBytecodeCache
+from markupsafe import Markup
+from werkzeug.formparser import FormDataParser, MultiPartParser
+from werkzeug.middleware.proxy_fix import ProxyFix
+from werkzeug.security import safe_join
 from werkzeug.utils import secure_filename
 
+try:  # optional: C serializer for /stats.json, several times faster than json
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+    import json
+
 # ---------------------------- CONFIG -----------------------------
 
 APP_NAME = "Halloween Costume Voting"
@@ -58,29 +100,158 @@ UPLOAD_DIR.mkdir(exist_ok=True)
 
 MAX_CONTENT_LENGTH = 5 * 1024 * 1024  # 5 MB
 ALLOWED_EXTS = {"jpg", "jpeg", "png", "gif"}
+UPLOAD_MAX_AGE = 86400  # seconds browsers may cache a served photo
+UPLOAD_SPOOL_SIZE = 1024 * 1024  # photo bytes held in memory before spilling to disk
+UPLOAD_COPY_BUFFER = 1024 * 1024  # chunk size when an in-memory upload is written out
+UPLOAD_READ_BUFFER = 256 * 1024  # bytes the multipart parser pulls from the socket per read
+# Behind nginx, point this at an `internal` location aliased to the uploads dir
+# (e.g. "/_uploads/") and nginx sends photo bytes itself via X-Accel-Redirect.
+UPLOADS_ACCEL_PREFIX = os.environ.get("UPLOADS_ACCEL_PREFIX", "")
+# Apache mod_xsendfile / lighttpd: answer photo requests with an X-Sendfile header
+# and let the front server send the file. Without either, gunicorn's
+# wsgi.file_wrapper already streams send_from_directory() bodies via sendfile(2).
+USE_X_SENDFILE = os.environ.get("USE_X_SENDFILE") == "1"
+# Reverse proxies in front of the app that set X-Forwarded-For/-Proto. 0 trusts
+# none: those headers are client-controlled when nothing strips them.
+TRUSTED_PROXIES = int(os.environ.get("TRUSTED_PROXIES", "0"))
+
+# Compiled template bytecode, shared by workers and reused across restarts.
+# Unset: Jinja's per-user _jinja2-cache-<uid> dir under the temp dir.
+JINJA_BCC_DIR = os.environ.get("JINJA_BCC_DIR") or None
+
+STREAM_BUFFER = 50  # Jinja output pieces per chunk on streamed pages
+GZIP_MIN_SIZE = 1024  # smaller bodies aren't worth compressing
+GZIP_MIMETYPES = {"text/html", "text/css", "text/csv", "application/json"}
+
+CACHED_TABLES = ("entries", "categories")  # see _cached_rows
 
 EXPECTED_ATTENDEES = int(os.environ.get("EXPECTED_ATTENDEES", "0"))  # 0 = unknown
 APP_START_TS = dt.datetime.utcnow()  # uptime origin
 
+
+class UploadFormParser(FormDataParser):
+    """Multipart parsing with UPLOAD_READ_BUFFER-sized reads instead of Werkzeug's 64 KB.
+
+    A 5 MB photo then goes through the boundary scanner in ~20 passes rather
+    than ~80, and each spooled write is correspondingly larger.
+    """
+
+    def _parse_multipart(self, stream, mimetype, content_length, options):
+        boundary = options.get("boundary", "").encode("ascii")
+        if not boundary:
+            raise ValueError("Missing boundary")
+        parser = MultiPartParser(
+            stream_factory=self.stream_factory,
+            max_form_memory_size=self.max_form_memory_size,
+            max_form_parts=self.max_form_parts,
+            cls=self.cls,
+            buffer_size=UPLOAD_READ_BUFFER,
+        )
+        form, files = parser.parse(stream, boundary, content_length)
+        return stream, form, files
+
+
+class UploadRequest(Request):
+    """Spool multipart file parts in memory, rolling over to a temp file in UPLOAD_DIR.
+
+    Werkzeug's default factory picks BytesIO vs. a /tmp file from the total request
+    size up front; this decides per file part as bytes arrive, and keeps the disk
+    spill on the same volume the photo ends up on.
+    """
+
+    form_data_parser_class = UploadFormParser
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_SIZE, mode="rb+", dir=UPLOAD_DIR)
+
+
 app = Flask(__name__)
+app.request_class = UploadRequest
+if TRUSTED_PROXIES:
+    # remote_addr (the login throttle key) is the client, not the proxy
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXIES, x_proto=TRUSTED_PROXIES)
 app.config["MAX_CONTENT_LENGTH"] = MAX_CONTENT_LENGTH
 app.config["UPLOAD_FOLDER"] = str(UPLOAD_DIR)
+app.config["USE_X_SENDFILE"] = USE_X_SENDFILE
+# Templates are string constants in this file; even in debug there is nothing to reload
+app.config["TEMPLATES_AUTO_RELOAD"] = False
 app.secret_key = os.environ.get("FLASK_SECRET", secrets.token_hex(16))
 ADMIN_PASSWORD = os.environ.get("ADMIN_PASSWORD", "changeme")
+ADMIN_PASSWORD_HASH = hashlib.sha256(ADMIN_PASSWORD.encode("utf-8")).digest()
+
+# Admin login throttle: per-IP token bucket of LOGIN_BURST tries, refilled at LOGIN_RATE/s
+LOGIN_BURST = 5
+LOGIN_RATE = 1 / 6
 
 # -------------------------- DB UTILITIES -------------------------
 
 
-def get_db():
-    conn = sqlite3.connect(DB_PATH)
+def _connect() -> sqlite3.Connection:
+    # timeout= sets SQLite's busy handler (same as PRAGMA busy_timeout = 5000)
+    conn = sqlite3.connect(DB_PATH, timeout=5.0)
     conn.row_factory = sqlite3.Row
+    # These PRAGMAs are per-connection; only journal_mode persists in the DB file
     conn.execute("PRAGMA foreign_keys = ON;")
+    conn.execute("PRAGMA synchronous = NORMAL;")
+    conn.execute("PRAGMA temp_store = MEMORY;")
+    conn.execute("PRAGMA cache_size = -20000;")
+    conn.execute("PRAGMA mmap_size = 268435456;")
     return conn
 
 
+_local = threading.local()
+OPTIMIZE_INTERVAL = 3600.0  # seconds between PRAGMA optimize runs per connection
+
+
+def get_db() -> sqlite3.Connection:
+    """This thread's connection, opened on first use and kept for every later request.
+
+    gunicorn's gthread workers reuse their threads, so connect + PRAGMA setup happens
+    once per thread rather than once per request, and the page cache stays warm.
+    """
+    conn = getattr(_local, "db", None)
+    if conn is None:
+        conn = _local.db = _connect()
+        _local.optimized_at = time.monotonic()
+    return conn
+
+
+@app.teardown_appcontext
+def release_db(exc):
+    # Never carry an unfinished transaction (e.g. after an exception) into the next request
+    conn = getattr(_local, "db", None)
+    if conn is None:
+        return
+    if conn.in_transaction:
+        conn.rollback()
+    # Connections live as long as their thread, so "optimize before close" never
+    # comes; re-analyze whatever this connection's queries found stale instead.
+    if time.monotonic() - _local.optimized_at >= OPTIMIZE_INTERVAL:
+        _local.optimized_at = time.monotonic()
+        try:
+            conn.execute("PRAGMA optimize;")
+        except sqlite3.Error:
+            pass
+
+
+def voter_key(first: str, last: str) -> str:
+    """Case-insensitive voter identity, stored pre-lowered so lookups hit a plain index."""
+    # "|" joins the halves, so escape it (and the escape) or ("a|b", "c") == ("a", "b|c")
+    first, last = (
+        part.strip().lower().replace("\\", "\\\\").replace("|", "\\|") for part in (first, last)
+    )
+    return f"{first}|{last}"
+
+
 def init_db():
-    with get_db() as conn:
+    with closing(_connect()) as conn, conn:
         cur = conn.cursor()
+        # WAL lets page loads read while a ballot is being written; sticky once set
+        cur.execute("PRAGMA journal_mode = WAL;")
+        # gunicorn workers each import the app (and run this) at the same moment.
+        # Take the write lock up front so one worker migrates and seeds while the
+        # others wait, then find everything already in place.
+        cur.execute("BEGIN IMMEDIATE")
         cur.execute(
             """
             CREATE TABLE IF NOT EXISTS entries (
@@ -89,6 +260,7 @@ def init_db():
                 last_name TEXT NOT NULL,
                 costume_name TEXT NOT NULL,
                 photo_path TEXT,
+                photo_size INTEGER,
                 created_at TEXT NOT NULL
             );
             """
@@ -116,6 +288,7 @@ def init_db():
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 voter_first TEXT NOT NULL,
                 voter_last TEXT NOT NULL,
+                voter_key TEXT,
                 created_at TEXT NOT NULL
             );
             """
@@ -135,13 +308,53 @@ def init_db():
             """
         )
 
+        # Databases created before voter_key existed: add and backfill it. Should
+        # legacy rows already collide, only the first keeps its key (NULLs don't
+        # conflict), so the unique index below can always be built.
+        if "voter_key" not in {r["name"] for r in cur.execute("PRAGMA table_info(votes)")}:
+            cur.execute("ALTER TABLE votes ADD COLUMN voter_key TEXT")
+            seen = set()
+            for r in cur.execute("SELECT id, voter_first, voter_last FROM votes ORDER BY id").fetchall():
+                key = voter_key(r["voter_first"], r["voter_last"])
+                if key not in seen:
+                    seen.add(key)
+                    cur.execute("UPDATE votes SET voter_key=? WHERE id=?", (key, r["id"]))
+
+        # Keys from before "|" and backslash were escaped; other names' keys are unchanged.
+        # Equal names were already refused, so the rewritten keys can't clash.
+        for r in cur.execute(
+            "SELECT id, voter_first, voter_last, voter_key FROM votes WHERE voter_key IS NOT NULL "
+            "AND (voter_first || voter_last LIKE '%|%' OR instr(voter_first || voter_last, '\\') > 0)"
+        ).fetchall():
+            key = voter_key(r["voter_first"], r["voter_last"])
+            if key != r["voter_key"]:
+                cur.execute("UPDATE votes SET voter_key=? WHERE id=?", (key, r["id"]))
+
+        # Entries from before photo_size: record the size of photos still on disk
+        if "photo_size" not in {r["name"] for r in cur.execute("PRAGMA table_info(entries)")}:
+            cur.execute("ALTER TABLE entries ADD COLUMN photo_size INTEGER")
+            for r in cur.execute("SELECT id, photo_path FROM entries WHERE photo_path <> ''").fetchall():
+                try:
+                    size = (UPLOAD_DIR / r["photo_path"]).stat().st_size
+                except OSError:
+                    continue
+                cur.execute("UPDATE entries SET photo_size=? WHERE id=?", (size, r["id"]))
+
         # Indexes for faster admin queries
-        cur.execute(
-            "CREATE INDEX IF NOT EXISTS idx_votes_name ON votes(LOWER(voter_first), LOWER(voter_last));"
-        )
+        # Duplicate checks go through voter_key; the LOWER() expression index is dead weight
+        cur.execute("DROP INDEX IF EXISTS idx_votes_name;")
+        cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_votes_voter_key ON votes(voter_key);")
         cur.execute("CREATE INDEX IF NOT EXISTS idx_vote_items_vote ON vote_items(vote_id);")
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_vote_items_cat ON vote_items(category_id);")
+        # idx_vote_items_cat_entry covers category_id lookups on its own
+        cur.execute("DROP INDEX IF EXISTS idx_vote_items_cat;")
         cur.execute("CREATE INDEX IF NOT EXISTS idx_vote_items_entry ON vote_items(entry_id);")
+        cur.execute(
+            "CREATE INDEX IF NOT EXISTS idx_vote_items_cat_entry ON vote_items(category_id, entry_id);"
+        )
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_entries_created ON entries(created_at DESC);")
+        # Hourly buckets for the stats timeline, grouped straight off the index
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_entries_hour ON entries(substr(created_at, 1, 13));")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_votes_hour ON votes(substr(created_at, 1, 13));")
 
         # Seed categories if empty
         cur.execute("SELECT COUNT(*) FROM categories")
@@ -164,23 +377,140 @@ def init_db():
         if cur.fetchone() is None:
             cur.execute("INSERT INTO settings(key, value) VALUES('voting_enabled', '0')")
 
+        # Seed cache version tokens (see _cached_rows); fresh ones after a purge
+        for name in CACHED_TABLES:
+            cur.execute(
+                "INSERT OR IGNORE INTO settings(key, value) VALUES(?, ?)",
+                (f"{name}_version", secrets.token_hex(8)),
+            )
+
+        # Give the planner statistics from day one; PRAGMA optimize keeps them fresh
+        if cur.execute("SELECT 1 FROM sqlite_master WHERE name='sqlite_stat1'").fetchone() is None:
+            cur.execute("ANALYZE")
 
-@app.before_request
-def ensure_db():
-    init_db()
+
+# Schema setup runs once per process at import, not on every request.
+init_db()
 
 
 # ---------------------------- HELPERS ----------------------------
 
 
-def page(title: str, content_html: str):
-    return render_template_string(TPL_BASE, page_title=title, content=content_html)
+# Argument-free links used by the templates. Building one walks the URL map,
+# and a page has up to a dozen of them that never change, so build them once
+# per script root (the app may be mounted under a prefix) and hand templates
+# plain strings.
+STATIC_URL_ENDPOINTS = (
+    "home", "entry_form", "entry_submit", "vote_form", "vote_name_post",
+    "public_stats", "public_stats_json", "admin", "admin_login", "admin_logout",
+    "toggle_voting", "category_add", "admin_results", "admin_audit",
+    "admin_audit_csv", "admin_purge",
+)
+_url_cache: dict[str, SimpleNamespace] = {}
+
+
+def static_urls() -> SimpleNamespace:
+    urls = _url_cache.get(request.script_root)
+    if urls is None:
+        urls = SimpleNamespace(**{ep: url_for(ep) for ep in STATIC_URL_ENDPOINTS})
+        urls.app_css = url_for("app_css", v=APP_CSS_ETAG)
+        # Photo links are this prefix + the stored name. Stored names come from
+        # secure_filename plus a urlsafe token, so they never need quoting.
+        urls.uploads = url_for("uploaded_file", filename="x")[:-1]
+        _url_cache[request.script_root] = urls
+    return urls
+
+
+def page(title: str, template: str, *, flashes: bool = True, **ctx) -> str:
+    """Render a page. flashes=False is for pages nothing ever redirects to with
+    a message (polled stats/results): skips the flash lookup and so never
+    touches the session."""
+    messages = get_flashed_messages(with_categories=True) if flashes else ()
+    return ENV.get_template(template).render(page_title=title, urls=static_urls(), flashes=messages, **ctx)
+
+
+def page_stream(title: str, template: str, *, flashes: bool = True, **ctx) -> Response:
+    """Like page(), but sends the body while Jinja renders it (admin grids, audit, stats)."""
+    # Pop flashes before streaming: the session cookie is written before the
+    # body, so popping them mid-render would leave them in the cookie.
+    messages = get_flashed_messages(with_categories=True) if flashes else ()
+    body = ENV.get_template(template).stream(page_title=title, urls=static_urls(), flashes=messages, **ctx)
+    body.enable_buffering(STREAM_BUFFER)
+    return Response(stream_with_context(body), mimetype="text/html")
+
+
+# Pages whose HTML depends only on their arguments (home, entry form, admin
+# login). Render each variant once, keep it raw and gzipped at level 9, and
+# serve the bytes; only a pending flash message sends a request back to Jinja.
+_page_bytes: dict[tuple, tuple[bytes, bytes]] = {}
+
+
+def page_cached(title: str, template: str, **ctx) -> Response:
+    if "_flashes" in session:
+        return Response(page(title, template, **ctx), mimetype="text/html")
+    key = (template, title, request.script_root, tuple(sorted(ctx.items())))
+    hit = _page_bytes.get(key)
+    if hit is None:
+        raw = page(title, template, flashes=False, **ctx).encode("utf-8")
+        hit = _page_bytes[key] = (raw, gzip.compress(raw, compresslevel=9, mtime=0))
+    raw, gz = hit
+    if request.accept_encodings["gzip"] > 0:
+        # Already encoded, so gzip_response leaves it (and its Vary) alone
+        resp = Response(gz, mimetype="text/html")
+        resp.headers["Content-Encoding"] = "gzip"
+        resp.vary.add("Accept-Encoding")
+        return resp
+    return Response(raw, mimetype="text/html")
+
+
+def _gzip_chunks(chunks):
+    z = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 -> gzip container
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode("utf-8")
+            # Sync-flush so each rendered chunk reaches the client right away
+            yield z.compress(chunk) + z.flush(zlib.Z_SYNC_FLUSH)
+        yield z.flush()
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+
+
+@app.after_request
+def gzip_response(resp: Response) -> Response:
+    if (
+        resp.direct_passthrough  # files from send_from_directory
+        or resp.status_code != 200
+        or "Content-Encoding" in resp.headers
+        or resp.mimetype not in GZIP_MIMETYPES
+    ):
+        return resp
+    resp.vary.add("Accept-Encoding")
+    if request.accept_encodings["gzip"] <= 0:
+        return resp
+    if resp.is_streamed:
+        resp.response = _gzip_chunks(resp.response)
+    else:
+        data = resp.get_data()
+        if len(data) < GZIP_MIN_SIZE:
+            return resp
+        resp.set_data(gzip.compress(data, compresslevel=6))
+    resp.headers["Content-Encoding"] = "gzip"
+    etag, weak = resp.get_etag()
+    if etag and not weak:
+        # Different bytes than the identity body; at most weakly the same
+        resp.set_etag(etag, weak=True)
+    return resp
 
 
 def voting_closed():
     return page(
         "Voting Closed",
-        "<p class='text-center text-lg'>Voting is currently closed. Please check back later.</p>",
+        "notice",
+        message="Voting is currently closed. Please check back later.",
+        css_class="text-center text-lg",
     )
 
 
@@ -193,15 +523,72 @@ def require_admin():
         abort(403)
 
 
+_login_buckets: dict[str, tuple[float, float]] = {}
+
+
+def login_allowed(ip: str) -> bool:
+    """Take one token from the caller's bucket; False once it's empty."""
+    now = time.monotonic()
+    if len(_login_buckets) > 1000:
+        # Forget clients whose bucket has refilled anyway
+        full_after = LOGIN_BURST / LOGIN_RATE
+        for k, (_, ts) in list(_login_buckets.items()):
+            if now - ts > full_after:
+                _login_buckets.pop(k, None)
+    tokens, ts = _login_buckets.get(ip, (LOGIN_BURST, now))
+    tokens = min(LOGIN_BURST, tokens + (now - ts) * LOGIN_RATE)
+    allowed = tokens >= 1
+    _login_buckets[ip] = (tokens - 1 if allowed else tokens, now)
+    return allowed
+
+
 def allowed_file(filename: str) -> bool:
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTS
 
 
-def get_setting(key: str, default: str = "") -> str:
-    with get_db() as conn:
-        cur = conn.execute("SELECT value FROM settings WHERE key=?", (key,))
-        row = cur.fetchone()
-        return row["value"] if row else default
+def save_upload(file, dest: Path) -> int:
+    """Write an uploaded part to dest, kernel-to-kernel when it already spilled to disk.
+
+    Returns the number of bytes written.
+    """
+    src = file.stream
+    with open(dest, "wb") as out:
+        # UploadRequest hands us a SpooledTemporaryFile; _rolled means it has a real fd
+        if getattr(src, "_rolled", False):
+            try:
+                src.flush()
+                size = os.fstat(src.fileno()).st_size
+                offset = 0
+                while offset < size:
+                    sent = os.sendfile(out.fileno(), src.fileno(), offset, size - offset)
+                    if sent == 0:
+                        break
+                    offset += sent
+                return offset
+            except (AttributeError, OSError):  # no os.sendfile / file-to-file unsupported
+                out.seek(0)
+                out.truncate()
+        src.seek(0)
+        shutil.copyfileobj(src, out, UPLOAD_COPY_BUFFER)
+        return out.tell()
+
+
+# Settings are read on nearly every page but change a couple of times per party.
+# Cache them per process; other gunicorn workers pick up changes within the TTL.
+SETTINGS_TTL = 5.0  # seconds
+_settings_cache: dict[str, tuple[Optional[str], float]] = {}
+
+
+def get_setting(key: str, default: str = "", max_age: float = SETTINGS_TTL) -> str:
+    """Cached settings read; max_age=0 forces a fresh SELECT (and refreshes the cache)."""
+    hit = _settings_cache.get(key)
+    if hit is None or time.monotonic() - hit[1] >= max_age:
+        with get_db() as conn:
+            cur = conn.execute("SELECT value FROM settings WHERE key=?", (key,))
+            row = cur.fetchone()
+        hit = (row["value"] if row else None, time.monotonic())
+        _settings_cache[key] = hit
+    return default if hit[0] is None else hit[0]
 
 
 def set_setting(key: str, value: str) -> None:
@@ -211,21 +598,93 @@ def set_setting(key: str, value: str) -> None:
             "ON CONFLICT(key) DO UPDATE SET value=excluded.value",
             (key, value),
         )
+    # Write through so this worker sees its own change without another SELECT
+    _settings_cache[key] = (value, time.monotonic())
+
+
+def voting_enabled(exact: bool = False) -> bool:
+    """Hot-path flag for every /vote* request; exact=True skips the TTL."""
+    return get_setting("voting_enabled", "0", max_age=0 if exact else SETTINGS_TTL) == "1"
+
+
+# The voting wizard re-reads the same entry and category lists on every step.
+# Keep query results per process, keyed by a version token stored in settings
+# for the table they read; anything that changes a table writes a new token
+# (after its own commit) via bump_version.
+_row_cache: dict[str, tuple[str, list]] = {}
+
+
+def bump_version(table: str) -> None:
+    set_setting(f"{table}_version", secrets.token_hex(8))
+    invalidate_stats()
+
+
+def _cached_rows(table: str, sql: str, exact: bool = False) -> list:
+    """Rows for sql, reused until table's version token changes.
+
+    The token is normally read through the settings TTL, so another worker's change
+    shows up within SETTINGS_TTL. exact=True re-reads it (one primary-key lookup)
+    for pages that must reflect a change immediately, whichever worker made it.
+    """
+    memo = g.setdefault("row_memo", {})
+    if sql not in memo:
+        version = get_setting(f"{table}_version", max_age=0 if exact else SETTINGS_TTL)
+        hit = _row_cache.get(sql)
+        if hit is None or hit[0] != version:
+            with get_db() as conn:
+                hit = (version, conn.execute(sql).fetchall())
+            _row_cache[sql] = hit
+        memo[sql] = hit[1]
+    return memo[sql]
 
 
 def _enabled_categories():
-    with get_db() as conn:
-        return conn.execute(
-            "SELECT id, name FROM categories WHERE enabled=1 ORDER BY name"
-        ).fetchall()
+    return _cached_rows(
+        "categories", "SELECT id, name FROM categories WHERE enabled=1 ORDER BY name"
+    )
 
 
-def _all_entries():
-    with get_db() as conn:
-        return conn.execute(
-            "SELECT id, first_name, last_name, costume_name, photo_path "
-            "FROM entries ORDER BY created_at DESC"
-        ).fetchall()
+def _all_categories(exact: bool = False):
+    return _cached_rows(
+        "categories", "SELECT id, name, enabled FROM categories ORDER BY name", exact
+    )
+
+
+def _all_entries(exact: bool = False):
+    return _cached_rows(
+        "entries",
+        "SELECT id, first_name, last_name, costume_name, photo_path "
+        "FROM entries ORDER BY created_at DESC",
+        exact,
+    )
+
+
+def parse_id(raw: str) -> Optional[int]:
+    """Row id from untrusted text, or None. Plain ASCII digits only, and few
+    enough of them to fit a SQLite INTEGER (isdigit() alone admits "²")."""
+    if not (raw.isascii() and raw.isdigit()) or len(raw) > 18:
+        return None
+    return int(raw)
+
+
+# The wizard's picks live in the signed session cookie, re-serialized on every
+# step. Keep them as one "cid:eid,cid:eid" string: far smaller than a JSON object
+# of string keys, and parsing is a couple of str.split calls.
+def load_ballot() -> dict[int, int]:
+    ballot: dict[int, int] = {}
+    raw = session.get("ballot", "")
+    if not isinstance(raw, str):  # cookie from before the compact encoding
+        return ballot
+    for pair in raw.split(","):
+        cid, _, eid = pair.partition(":")
+        cid, eid = parse_id(cid), parse_id(eid)
+        if cid is not None and eid is not None:
+            ballot[cid] = eid
+    return ballot
+
+
+def store_ballot(ballot: dict[int, int]) -> None:
+    session["ballot"] = ",".join(f"{cid}:{eid}" for cid, eid in ballot.items())
 
 
 # Short redirect helpers
@@ -250,32 +709,42 @@ def to_step(i: int):
 
 @app.get("/")
 def home():
-    voting_enabled = get_setting("voting_enabled", "0") == "1"
-    return page(
-        "Halloween Costume Voting",
-        render_template_string(TPL_HOME, voting_enabled=voting_enabled),
-    )
+    return page_cached("Halloween Costume Voting", "home", voting_enabled=voting_enabled())
 
 
 @app.get("/stats")
 def public_stats():
-    data = stats_gather()
-    return page("Stats for Nerds", render_template_string(TPL_ADMIN_STATS, d=data))
+    data = stats_snapshot()
+    # Both hourly series on one axis, so the page renders a single timeline loop
+    entries = {r["hour"]: r["count"] for r in data["timeline"]["entries_hourly"]}
+    votes = {r["hour"]: r["count"] for r in data["timeline"]["votes_hourly"]}
+    hourly = [(h, entries.get(h, 0), votes.get(h, 0)) for h in sorted(entries.keys() | votes.keys())]
+    up = data["uptime_seconds"]
+    return page_stream(
+        "Stats for Nerds",
+        "admin_stats",
+        flashes=False,
+        d=data,
+        hourly=hourly,
+        uptime=f"{up // 3600}h {up // 60 % 60}m",
+        progress="n/a" if data["progress_pct"] is None else f"{data['progress_pct']}%",
+    )
 
 
 @app.get("/stats.json")
 def public_stats_json():
-    import json
-
-    return Response(
-        json.dumps(stats_gather(), indent=2), mimetype="application/json"
-    )
+    data = stats_snapshot()
+    if orjson is not None:
+        body = orjson.dumps(data, option=orjson.OPT_INDENT_2)
+    else:
+        body = json.dumps(data, indent=2)
+    return Response(body, mimetype="application/json")
 
 
 # --- Entries ---
 @app.get("/entry")
 def entry_form():
-    return page("Submit Your Costume", render_template_string(TPL_ENTRY_FORM))
+    return page_cached("Submit Your Costume", "entry_form")
 
 
 @app.post("/entry")
@@ -288,31 +757,67 @@ def entry_submit():
         return redirect(url_for("entry_form"))
 
     photo_path: Optional[str] = None
+    photo_size: Optional[int] = None
     file = request.files.get("photo")
     if file and file.filename:
         if not allowed_file(file.filename):
             flash("Invalid photo type. Allowed: jpg, jpeg, png, gif", "error")
             return redirect(url_for("entry_form"))
         fname = secure_filename(file.filename)
-        unique = f"{dt.datetime.utcnow().strftime('%Y%m%d%H%M%S')}_{secrets.token_hex(4)}_{fname}"
+        token = base64.urlsafe_b64encode(os.urandom(6)).decode("ascii")  # 8 URL-safe chars
+        unique = f"{int(time.time())}_{token}_{fname}"
         save_path = UPLOAD_DIR / unique
-        file.save(save_path)
+        photo_size = save_upload(file, save_path)
         photo_path = unique
+        invalidate_storage()
 
     with get_db() as conn:
         conn.execute(
-            "INSERT INTO entries(first_name, last_name, costume_name, photo_path, created_at) "
-            "VALUES(?,?,?,?,?)",
-            (first, last, costume, photo_path, dt.datetime.utcnow().isoformat()),
+            "INSERT INTO entries(first_name, last_name, costume_name, photo_path, photo_size, created_at) "
+            "VALUES(?,?,?,?,?,?)",
+            (first, last, costume, photo_path, photo_size, dt.datetime.utcnow().isoformat()),
         )
 
+    bump_version("entries")
     flash("Costume submitted!", "success")
     return redirect(url_for("home"))
 
 
 @app.get("/uploads/<path:filename>")
 def uploaded_file(filename):
-    return send_from_directory(app.config["UPLOAD_FOLDER"], filename)
+    if UPLOADS_ACCEL_PREFIX:
+        # Empty response; nginx swaps in the file and keeps our headers
+        path = safe_join(app.config["UPLOAD_FOLDER"], filename)
+        if path is None or not os.path.isfile(path):
+            abort(404)
+        resp = Response(mimetype=mimetypes.guess_type(filename)[0] or "application/octet-stream")
+        resp.headers["X-Accel-Redirect"] = UPLOADS_ACCEL_PREFIX.rstrip("/") + "/" + quote(filename)
+        resp.cache_control.public = True
+        resp.cache_control.max_age = UPLOAD_MAX_AGE
+    else:
+        resp = send_from_directory(
+            app.config["UPLOAD_FOLDER"], filename, conditional=True, max_age=UPLOAD_MAX_AGE
+        )
+    # Stored names are unique per upload (timestamp + random token) and never
+    # rewritten, so browsers can keep them without revalidating.
+    resp.cache_control.immutable = True
+    return resp
+
+
+@app.get("/static/app.css")
+def app_css():
+    if request.accept_encodings["gzip"] > 0:
+        resp = Response(APP_CSS_GZIP, mimetype="text/css")
+        resp.headers["Content-Encoding"] = "gzip"
+        resp.set_etag(APP_CSS_ETAG + "-gz")
+    else:
+        resp = Response(APP_CSS_BYTES, mimetype="text/css")
+        resp.set_etag(APP_CSS_ETAG)
+    resp.vary.add("Accept-Encoding")
+    resp.cache_control.public = True
+    resp.cache_control.max_age = 31536000
+    resp.cache_control.immutable = True
+    return resp.make_conditional(request)
 
 
 # ------------------------------ VOTING ----------------------------
@@ -321,14 +826,14 @@ def uploaded_file(filename):
 @app.get("/vote")
 def vote_form():
     """Redirect into the wizard (name page first) if voting is enabled; otherwise show 'closed'."""
-    if get_setting("voting_enabled", "0") != "1":
+    if not voting_enabled():
         return voting_closed()
     return to_name()
 
 
 @app.get("/vote/name")
 def vote_name():
-    if get_setting("voting_enabled", "0") != "1":
+    if not voting_enabled():
         return voting_closed()
 
     cats = _enabled_categories()
@@ -338,64 +843,63 @@ def vote_name():
 
     return page(
         "Cast Your Votes",
-        render_template_string(
-            TPL_VOTE_NAME,
-            voter_first=voter_first,
-            voter_last=voter_last,
-            step=1,
-            total=total_steps,
-        ),
+        "vote_name",
+        voter_first=voter_first,
+        voter_last=voter_last,
+        step=1,
+        total=total_steps,
+        pct=100 // total_steps,
     )
 
 
 @app.post("/vote/name")
 def vote_name_post():
-    if get_setting("voting_enabled", "0") != "1":
+    if not voting_enabled():
         abort(403)
     vf = request.form.get("voter_first", "").strip()
     vl = request.form.get("voter_last", "").strip()
     if not vf or not vl:
         flash("Please enter your first and last name.", "error")
         return to_name()
-    session["voter_first"] = vf
-    session["voter_last"] = vl
+    if (session.get("voter_first"), session.get("voter_last")) != (vf, vl):
+        session["voter_first"] = vf
+        session["voter_last"] = vl
     return to_step(0)
 
 
 @app.get("/vote/step/<int:idx>")
 def vote_step(idx: int):
-    if get_setting("voting_enabled", "0") != "1":
+    if not voting_enabled():
         return voting_closed()
 
     cats = _enabled_categories()
     if not cats:
-        return page("Cast Your Votes", "<p class='muted'>No categories are enabled.</p>")
+        return page("Cast Your Votes", "notice", message="No categories are enabled.", css_class="muted")
     if idx < 0 or idx >= len(cats):
         return to_name()
 
-    entries = _all_entries()
-    ballot = session.get("ballot", {})
+    selected_entry_id = load_ballot().get(cats[idx]["id"], 0)
+    # Mark the current pick here once instead of comparing inside the radio loop
+    entries = [(e, e["id"] == selected_entry_id) for e in _all_entries()]
     total_steps = len(cats) + 1
     step_display = 2 + idx  # 1=name, 2=first category
 
     return page(
         "Cast Your Votes",
-        render_template_string(
-            TPL_VOTE_WIZARD,
-            categories=cats,
-            category=cats[idx],
-            entries=entries,
-            idx=idx,
-            ballot=ballot,
-            step=step_display,
-            total=total_steps,
-        ),
+        "vote_wizard",
+        categories=cats,
+        category=cats[idx],
+        entries=entries,
+        idx=idx,
+        step=step_display,
+        total=total_steps,
+        pct=step_display * 100 // total_steps,
     )
 
 
 @app.post("/vote/step/<int:idx>")
 def vote_step_post(idx: int):
-    if get_setting("voting_enabled", "0") != "1":
+    if not voting_enabled():
         abort(403)
 
     cats = _enabled_categories()
@@ -406,14 +910,15 @@ def vote_step_post(idx: int):
         return to_name()
 
     current_cat = cats[idx]
-    choice = request.form.get("choice_entry_id")
-    ballot = session.get("ballot", {})
-    if choice:
-        try:
-            ballot[str(current_cat["id"])] = int(choice)
-        except ValueError:
-            pass
-        session["ballot"] = ballot
+    choice = parse_id(request.form.get("choice_entry_id", ""))
+    # Only keep picks of real entries, so vote_finish never binds a made-up id
+    if choice is not None and any(e["id"] == choice for e in _all_entries()):
+        ballot = load_ballot()
+        # Writing the session means a re-sign and a Set-Cookie on the response;
+        # paging back and forth over unchanged picks shouldn't cost either
+        if ballot.get(current_cat["id"]) != choice:
+            ballot[current_cat["id"]] = choice
+            store_ballot(ballot)
 
     nav = request.form.get("nav", "next")
     if nav == "prev":
@@ -426,7 +931,7 @@ def vote_step_post(idx: int):
 
 @app.get("/vote/finish")
 def vote_finish():
-    if get_setting("voting_enabled", "0") != "1":
+    if not voting_enabled():
         abort(403)
 
     voter_first = session.get("voter_first", "").strip()
@@ -435,36 +940,42 @@ def vote_finish():
         flash("Missing voter name; please start again.", "error")
         return to_name()
 
-    with get_db() as conn:
-        existing = conn.execute(
-            "SELECT id FROM votes WHERE LOWER(voter_first)=LOWER(?) AND LOWER(voter_last)=LOWER(?)",
-            (voter_first, voter_last),
-        ).fetchone()
-        if existing:
-            flash("Our records show you've already submitted a ballot.", "error")
-            return to_home()
+    # Read categories before opening the transaction: _enabled_categories() may
+    # query (and commit) on the same connection.
+    cats = _enabled_categories()
+    ballot = load_ballot()
 
+    with get_db() as conn:
         cur = conn.cursor()
+        # The unique voter_key index makes this the duplicate check as well;
+        # only a voter_key clash is swallowed, any other constraint still raises
         cur.execute(
-            "INSERT INTO votes(voter_first, voter_last, created_at) VALUES(?,?,?)",
-            (voter_first, voter_last, dt.datetime.utcnow().isoformat()),
+            "INSERT INTO votes(voter_first, voter_last, voter_key, created_at) "
+            "VALUES(?,?,?,?) ON CONFLICT(voter_key) DO NOTHING",
+            (
+                voter_first,
+                voter_last,
+                voter_key(voter_first, voter_last),
+                dt.datetime.utcnow().isoformat(),
+            ),
         )
+        if cur.rowcount == 0:
+            flash("Our records show you've already submitted a ballot.", "error")
+            return to_home()
         vote_id = cur.lastrowid
 
-        cats = _enabled_categories()
-        ballot = session.get("ballot", {})
-        for c in cats:
-            key = str(c["id"])
-            entry_id = ballot.get(key)
-            if entry_id:
-                try:
-                    cur.execute(
-                        "INSERT INTO vote_items(vote_id, category_id, entry_id) VALUES(?,?,?)",
-                        (vote_id, c["id"], int(entry_id)),
-                    )
-                except Exception:
-                    pass
+        items = [(vote_id, ballot[c["id"]], c["id"]) for c in cats if c["id"] in ballot]
+        # cats may be a few seconds stale in this worker: INSERT ... SELECT
+        # silently drops picks whose entry was deleted, or whose category was
+        # deleted or disabled, mid-vote
+        cur.executemany(
+            "INSERT INTO vote_items(vote_id, category_id, entry_id) "
+            "SELECT ?, c.id, e.id FROM categories c JOIN entries e ON e.id=? "
+            "WHERE c.id=? AND c.enabled=1",
+            items,
+        )
 
+    invalidate_stats()
     for k in ("voter_first", "voter_last", "ballot"):
         session.pop(k, None)
 
@@ -478,33 +989,29 @@ def vote_finish():
 @app.get("/admin")
 def admin():
     if not is_admin():
-        return page("Admin Login", render_template_string(TPL_ADMIN_LOGIN))
+        return page_cached("Admin Login", "admin_login")
 
-    with get_db() as conn:
-        entries = conn.execute(
-            "SELECT id, first_name, last_name, costume_name, photo_path, created_at "
-            "FROM entries ORDER BY created_at DESC"
-        ).fetchall()
-        cats = conn.execute(
-            "SELECT id, name, enabled FROM categories ORDER BY name"
-        ).fetchall()
-    voting_enabled = get_setting("voting_enabled", "0") == "1"
+    # exact: right after an admin action the redirect may land on another worker
+    entries = _all_entries(exact=True)
+    cats = _all_categories(exact=True)
+    enabled = voting_enabled(exact=True)
 
-    return page(
+    return page_stream(
         "Admin Dashboard",
-        render_template_string(
-            TPL_ADMIN_DASH,
-            entries=entries,
-            categories=cats,
-            voting_enabled=voting_enabled,
-        ),
+        "admin_dash",
+        entries=entries,
+        categories=cats,
+        voting_enabled=enabled,
     )
 
 
 @app.post("/admin/login")
 def admin_login():
+    if not login_allowed(request.remote_addr or ""):
+        flash("Too many login attempts. Please wait a minute and try again.", "error")
+        return to_admin()
     pwd = request.form.get("password", "")
-    if pwd == ADMIN_PASSWORD:
+    if hmac.compare_digest(hashlib.sha256(pwd.encode("utf-8")).digest(), ADMIN_PASSWORD_HASH):
         session["admin"] = True
         flash("Logged in as admin.", "success")
         return to_admin()
@@ -522,9 +1029,11 @@ def admin_logout():
 @app.post("/admin/toggle_voting")
 def toggle_voting():
     require_admin()
-    current = get_setting("voting_enabled", "0")
-    set_setting("voting_enabled", "0" if current == "1" else "1")
-    flash(f"Voting {'enabled' if current == '0' else 'disabled'}.", "success")
+    # Fresh read: flipping a value another worker cached as stale would undo a toggle
+    enabled = voting_enabled(exact=True)
+    set_setting("voting_enabled", "0" if enabled else "1")
+    invalidate_stats()
+    flash(f"Voting {'disabled' if enabled else 'enabled'}.", "success")
     return to_admin()
 
 
@@ -538,6 +1047,7 @@ def category_add():
     try:
         with get_db() as conn:
             conn.execute("INSERT INTO categories(name, enabled) VALUES(?,1)", (name,))
+        bump_version("categories")
         flash("Category added.", "success")
     except sqlite3.IntegrityError:
         flash("Category already exists.", "error")
@@ -552,6 +1062,7 @@ def category_toggle(cat_id: int):
         if cur is None:
             abort(404)
         conn.execute("UPDATE categories SET enabled=? WHERE id=?", (0 if cur["enabled"] else 1, cat_id))
+    bump_version("categories")
     flash("Category updated.", "success")
     return to_admin()
 
@@ -566,6 +1077,7 @@ def category_rename(cat_id: int):
     try:
         with get_db() as conn:
             conn.execute("UPDATE categories SET name=? WHERE id=?", (new_name, cat_id))
+        bump_version("categories")
         flash("Category renamed.", "success")
     except sqlite3.IntegrityError:
         flash("A category with that name already exists.", "error")
@@ -583,6 +1095,8 @@ def entry_delete(entry_id: int):
             (UPLOAD_DIR / row["photo_path"]).unlink(missing_ok=True)
         except Exception:
             pass
+        invalidate_storage()
+    bump_version("entries")
     flash("Entry deleted.", "success")
     return to_admin()
 
@@ -595,6 +1109,7 @@ def category_delete(cat_id: int):
         if not cur:
             abort(404)
         conn.execute("DELETE FROM categories WHERE id=?", (cat_id,))
+    bump_version("categories")
     flash("Category deleted.", "success")
     return to_admin()
 
@@ -602,104 +1117,129 @@ def category_delete(cat_id: int):
 @app.get("/admin/results")
 def admin_results():
     require_admin()
-    tallies = {}
     with get_db() as conn:
-        cats = conn.execute("SELECT id, name FROM categories ORDER BY name").fetchall()
-        for c in cats:
-            rows = conn.execute(
-                """
-                SELECT e.id as entry_id, e.first_name, e.last_name, e.costume_name, e.photo_path,
-                       COUNT(vi.id) as votes
-                FROM entries e
-                LEFT JOIN vote_items vi
-                  ON vi.entry_id = e.id AND vi.category_id = ?
-                GROUP BY e.id
-                ORDER BY votes DESC, e.costume_name ASC
-                """,
-                (c["id"],),
-            ).fetchall()
-            tallies[c["name"]] = rows
+        # Count vote_items once per (category, entry) -- straight off the composite
+        # index -- then lay the counts over every category x entry pair. The
+        # ON 1=1 LEFT JOIN keeps categories with no entries (entry_id is NULL).
+        rows = conn.execute(
+            """
+            SELECT c.name AS cat_name,
+                   e.id as entry_id, e.first_name, e.last_name, e.costume_name, e.photo_path,
+                   COALESCE(t.votes, 0) as votes
+            FROM categories c
+            LEFT JOIN entries e ON 1 = 1
+            LEFT JOIN (
+                SELECT category_id, entry_id, COUNT(*) AS votes
+                FROM vote_items
+                GROUP BY category_id, entry_id
+            ) t ON t.category_id = c.id AND t.entry_id = e.id
+            ORDER BY c.name ASC, votes DESC, e.costume_name ASC
+            """
+        ).fetchall()
+
+    tallies = {}
+    for cat_name, cat_rows in groupby(rows, key=lambda r: r["cat_name"]):
+        standings = tuple(
+            ResultRow(r["entry_id"], r["first_name"], r["last_name"], r["costume_name"], r["photo_path"], r["votes"])
+            for r in cat_rows
+            if r["entry_id"] is not None
+        )
+        tallies[cat_name] = _results_rows_html(request.script_root, standings)
+
+    return page_stream("Results", "results", flashes=False, tallies=tallies)
 
-    return page("Results", render_template_string(TPL_RESULTS, tallies=tallies))
+
+# The results page is left open and refreshed during the party, and most
+# categories' standings are unchanged between refreshes. Cache each category's
+# rendered rows keyed by exactly what they show, so a new vote (or an edit)
+# changes the key and nothing needs explicit invalidation.
+ResultRow = namedtuple("ResultRow", "entry_id first_name last_name costume_name photo_path votes")
+
+
+@lru_cache(maxsize=64)
+def _results_rows_html(script_root: str, standings: tuple) -> Markup:
+    if not standings:
+        return Markup("")
+    return Markup(ENV.get_template("results_rows").render(rows=standings, urls=static_urls()))
 
 
 # -------- Admin Audit (who voted for what) + CSV export ---------
 
 
+AUDIT_SQL = """
+SELECT
+  v.id           AS vote_id,
+  v.voter_first  AS voter_first,
+  v.voter_last   AS voter_last,
+  v.created_at   AS voted_at,
+  c.name         AS category_name,
+  e.costume_name AS costume_name,
+  e.first_name   AS entry_first,
+  e.last_name    AS entry_last
+FROM votes v
+JOIN vote_items vi ON vi.vote_id   = v.id
+JOIN categories c  ON c.id         = vi.category_id
+JOIN entries e     ON e.id         = vi.entry_id
+ORDER BY v.created_at DESC, v.id DESC, c.name ASC, e.costume_name ASC
+"""
+
+
 @app.get("/admin/audit")
 def admin_audit():
     require_admin()
-    with get_db() as conn:
-        rows = conn.execute(
-            """
-            SELECT
-              v.id           AS vote_id,
-              v.voter_first  AS voter_first,
-              v.voter_last   AS voter_last,
-              v.created_at   AS voted_at,
-              c.name         AS category_name,
-              e.costume_name AS costume_name,
-              e.first_name   AS entry_first,
-              e.last_name    AS entry_last
-            FROM votes v
-            JOIN vote_items vi ON vi.vote_id   = v.id
-            JOIN categories c  ON c.id         = vi.category_id
-            JOIN entries e     ON e.id         = vi.entry_id
-            ORDER BY v.created_at DESC, c.name ASC, e.costume_name ASC
-            """
-        ).fetchall()
+    cur = get_db().execute(AUDIT_SQL)
 
-    return page("Audit — Who Voted For What", render_template_string(TPL_ADMIN_AUDIT, rows=rows))
+    # One card per ballot: rows arrive grouped by vote (see AUDIT_SQL's ORDER BY),
+    # and the first row of each group carries the voter columns for the header.
+    # A generator over the live cursor, so the streamed page pulls one ballot
+    # at a time instead of holding every row first.
+    def ballots():
+        for _, vote_rows in groupby(cur, key=lambda r: r["vote_id"]):
+            items = list(vote_rows)
+            yield items[0], items
+
+    return page_stream("Audit — Who Voted For What", "admin_audit", ballots=ballots())
 
 
 @app.get("/admin/audit.csv")
 def admin_audit_csv():
     require_admin()
-    with get_db() as conn:
-        rows = conn.execute(
-            """
-            SELECT
-              v.id           AS vote_id,
-              v.voter_first  AS voter_first,
-              v.voter_last   AS voter_last,
-              v.created_at   AS voted_at,
-              c.name         AS category_name,
-              e.costume_name AS costume_name,
-              e.first_name   AS entry_first,
-              e.last_name    AS entry_last
-            FROM votes v
-            JOIN vote_items vi ON vi.vote_id   = v.id
-            JOIN categories c  ON c.id         = vi.category_id
-            JOIN entries e     ON e.id         = vi.entry_id
-            ORDER BY v.created_at DESC, c.name ASC, e.costume_name ASC
-            """
-        ).fetchall()
-
-    # Build CSV
-    import csv
-    import io
-
-    buf = io.StringIO()
-    writer = csv.writer(buf)
-    writer.writerow(
-        ["vote_id", "voter_first", "voter_last", "voted_at", "category", "costume_name", "entry_first", "entry_last"]
-    )
-    for r in rows:
-        writer.writerow(
-            [
-                r["vote_id"],
-                r["voter_first"],
-                r["voter_last"],
-                r["voted_at"],
-                r["category_name"],
-                r["costume_name"],
-                r["entry_first"],
-                r["entry_last"],
-            ]
+    conn = get_db()
+    cur = conn.execute(AUDIT_SQL)
+
+    # Stream one line per row through a small reused buffer: memory stays flat
+    # and the download starts before the last row is read.
+    def generate():
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+
+        def line(row) -> str:
+            buf.seek(0)
+            buf.truncate()
+            writer.writerow(row)
+            return buf.getvalue()
+
+        yield line(
+            ["vote_id", "voter_first", "voter_last", "voted_at", "category", "costume_name", "entry_first", "entry_last"]
         )
-    csv_bytes = buf.getvalue().encode("utf-8")
+        for r in cur:
+            yield line(
+                (
+                    r["vote_id"],
+                    r["voter_first"],
+                    r["voter_last"],
+                    r["voted_at"],
+                    r["category_name"],
+                    r["costume_name"],
+                    r["entry_first"],
+                    r["entry_last"],
+                )
+            )
+
     return Response(
-        csv_bytes, mimetype="text/csv", headers={"Content-Disposition": "attachment; filename=audit_votes.csv"}
+        stream_with_context(generate()),
+        mimetype="text/csv",
+        headers={"Content-Disposition": "attachment; filename=audit_votes.csv"},
     )
 
 
@@ -716,11 +1256,41 @@ def _human_bytes(n: int) -> str:
     return f"{x:.1f} {units[i]}"
 
 
-def _dir_size(path: Path) -> int:
+# The uploads total means a stat() per file; /stats gets polled, so keep it
+# for a few seconds. Uploads and deletes in this worker invalidate.
+STORAGE_TTL = 5.0  # seconds
+_storage_cache: dict = {}
+
+
+def _storage_usage() -> dict:
+    """Bytes on disk: {"db": database incl. WAL, "uploads": everything in UPLOAD_DIR}."""
+    hit = _storage_cache.get("v")
+    if hit is not None and time.monotonic() - hit[1] < STORAGE_TTL:
+        return hit[0]
+    db = 0
+    for p in (DB_PATH, DB_PATH.with_name(DB_PATH.name + "-wal")):
+        try:
+            db += p.stat().st_size
+        except OSError:
+            pass
+    uploads = 0
     try:
-        return sum(p.stat().st_size for p in path.glob("**/*") if p.is_file())
-    except Exception:
-        return 0
+        with os.scandir(UPLOAD_DIR) as it:
+            for entry in it:
+                try:
+                    if entry.is_file():
+                        uploads += entry.stat().st_size
+                except OSError:
+                    pass
+    except OSError:
+        pass
+    usage = {"db": db, "uploads": uploads}
+    _storage_cache["v"] = (usage, time.monotonic())
+    return usage
+
+
+def invalidate_storage() -> None:
+    _storage_cache.clear()
 
 
 def stats_gather():
@@ -735,32 +1305,45 @@ def stats_gather():
         ).fetchone()
         last_vote_at = last_vote_row["created_at"] if last_vote_row else None
 
-        enabled_cats = conn.execute(
-            "SELECT id, name FROM categories WHERE enabled=1 ORDER BY name"
-        ).fetchall()
-        disabled_cats = conn.execute(
-            "SELECT id, name FROM categories WHERE enabled=0 ORDER BY name"
-        ).fetchall()
+        cats = conn.execute("SELECT id, name, enabled FROM categories ORDER BY name").fetchall()
+        enabled_count = sum(1 for c in cats if c["enabled"])
 
-        # Per-category participation and leaders
-        per_category = []
-        for c in conn.execute("SELECT id, name FROM categories ORDER BY name").fetchall():
-            part = conn.execute(
-                "SELECT COUNT(*) FROM vote_items WHERE category_id=?", (c["id"],)
-            ).fetchone()[0]
-
-            leaders = conn.execute(
-                """
-                SELECT e.costume_name AS name, e.first_name AS first, e.last_name AS last,
-                       COUNT(vi.id) AS votes
-                FROM entries e
-                LEFT JOIN vote_items vi ON vi.entry_id = e.id AND vi.category_id = ?
-                GROUP BY e.id
-                ORDER BY votes DESC, e.costume_name ASC
-                LIMIT 2
-                """,
-                (c["id"],),
+        # Per-category participation and leaders: one grouped query each instead
+        # of two queries per category.
+        participation = dict(
+            conn.execute(
+                "SELECT category_id, COUNT(*) FROM vote_items GROUP BY category_id"
             ).fetchall()
+        )
+        # Top two entries per category by votes. Entries with no votes still
+        # rank (LEFT JOIN), so a category with entries always has a leader.
+        leaders_by_cat: dict[int, list] = {}
+        for r in conn.execute(
+            """
+            SELECT cat_id, name, first, last, votes FROM (
+                SELECT c.id AS cat_id, e.costume_name AS name, e.first_name AS first,
+                       e.last_name AS last, COALESCE(t.votes, 0) AS votes,
+                       ROW_NUMBER() OVER (
+                           PARTITION BY c.id
+                           ORDER BY COALESCE(t.votes, 0) DESC, e.costume_name ASC, e.id ASC
+                       ) AS rank
+                FROM categories c
+                JOIN entries e
+                LEFT JOIN (
+                    SELECT category_id, entry_id, COUNT(*) AS votes
+                    FROM vote_items
+                    GROUP BY category_id, entry_id
+                ) t ON t.category_id = c.id AND t.entry_id = e.id
+            )
+            WHERE rank <= 2
+            ORDER BY cat_id, rank
+            """
+        ):
+            leaders_by_cat.setdefault(r["cat_id"], []).append(r)
+
+        per_category = []
+        for c in cats:
+            leaders = leaders_by_cat.get(c["id"], [])
             leader = None
             margin = None
             if leaders:
@@ -777,47 +1360,40 @@ def stats_gather():
                 {
                     "id": c["id"],
                     "name": c["name"],
-                    "participation": part,
+                    "participation": participation.get(c["id"], 0),
                     "leader": leader,
                     "lead_margin": margin,
                 }
             )
 
         # Timeline: hourly buckets (UTC)
-        entries_by_hour = conn.execute(
-            """
-            SELECT substr(created_at, 1, 13) AS hour, COUNT(*) AS count
-            FROM entries
-            GROUP BY hour
-            ORDER BY hour
-            """
-        ).fetchall()
-        votes_by_hour = conn.execute(
+        # One round trip; each half walks its idx_*_hour index already in order.
+        entries_by_hour, votes_by_hour = [], []
+        for r in conn.execute(
             """
-            SELECT substr(created_at, 1, 13) AS hour, COUNT(*) AS count
-            FROM votes
-            GROUP BY hour
-            ORDER BY hour
+            SELECT * FROM (
+              SELECT 'e' AS src, substr(created_at, 1, 13) AS hour, COUNT(*) AS count
+              FROM entries GROUP BY hour ORDER BY hour
+            )
+            UNION ALL
+            SELECT * FROM (
+              SELECT 'v', substr(created_at, 1, 13) AS hour, COUNT(*)
+              FROM votes GROUP BY hour ORDER BY hour
+            )
             """
-        ).fetchall()
+        ):
+            (entries_by_hour if r["src"] == "e" else votes_by_hour).append(r)
 
         # Photo stats
-        photos = conn.execute(
-            "SELECT photo_path FROM entries WHERE photo_path IS NOT NULL AND photo_path <> ''"
-        ).fetchall()
-        photo_files = [UPLOAD_DIR / r["photo_path"] for r in photos if r["photo_path"]]
-        sizes = []
-        for p in photo_files:
-            try:
-                sizes.append(p.stat().st_size)
-            except Exception:
-                pass
-        photos_with = len(photo_files)
-        avg_photo_size = sum(sizes) / len(sizes) if sizes else 0
+        photos_with, avg_photo_size = conn.execute(
+            "SELECT COUNT(*), COALESCE(AVG(photo_size), 0) FROM entries "
+            "WHERE photo_path IS NOT NULL AND photo_path <> ''"
+        ).fetchone()
 
     # Storage info
-    db_size = DB_PATH.stat().st_size if DB_PATH.exists() else 0
-    uploads_size = _dir_size(UPLOAD_DIR)
+    usage = _storage_usage()
+    db_size = usage["db"]
+    uploads_size = usage["uploads"]
 
     # Uptime
     uptime = (now - APP_START_TS).total_seconds()
@@ -829,14 +1405,14 @@ def stats_gather():
 
     return {
         "now_utc": now.isoformat(timespec="seconds"),
-        "voting_enabled": get_setting("voting_enabled", "0") == "1",
+        "voting_enabled": voting_enabled(),
         "expected_attendees": EXPECTED_ATTENDEES,
         "progress_pct": progress,
         "counts": {
             "entries": total_entries,
             "votes": total_votes,
-            "categories_enabled": len(enabled_cats),
-            "categories_disabled": len(disabled_cats),
+            "categories_enabled": enabled_count,
+            "categories_disabled": len(cats) - enabled_count,
         },
         "last_vote_at": last_vote_at,
         "per_category": per_category,
@@ -857,6 +1433,30 @@ def stats_gather():
     }
 
 
+# /stats and /stats.json are what people leave open on a screen and what
+# scrapers poll. Serve every hit within STATS_TTL from one gather, and let only
+# one thread compute when it expires. Writes in this worker invalidate it.
+STATS_TTL = 2.0  # seconds
+_stats_cache: dict = {}
+_stats_lock = threading.Lock()
+
+
+def stats_snapshot() -> dict:
+    hit = _stats_cache.get("v")
+    if hit is not None and time.monotonic() - hit[1] < STATS_TTL:
+        return hit[0]
+    with _stats_lock:
+        hit = _stats_cache.get("v")  # another thread may have just refreshed it
+        if hit is None or time.monotonic() - hit[1] >= STATS_TTL:
+            hit = (stats_gather(), time.monotonic())
+            _stats_cache["v"] = hit
+    return hit[0]
+
+
+def invalidate_stats() -> None:
+    _stats_cache.clear()
+
+
 # ------------------------------ PURGE -----------------------------
 
 
@@ -865,34 +1465,133 @@ def admin_purge():
     """Danger zone: wipe all entries, votes, and categories; reset settings; delete uploaded photos; reseed defaults."""
     require_admin()
 
-    # Delete uploaded images
+    # Delete uploaded images. Not shutil.rmtree: in the container UPLOAD_DIR is a
+    # symlink to a mounted volume, so only its contents can go.
     try:
-        for p in UPLOAD_DIR.iterdir():
-            if p.is_file():
-                try:
-                    p.unlink()
-                except Exception:
-                    pass
+        with os.scandir(UPLOAD_DIR) as it:
+            for entry in it:
+                if entry.is_file():
+                    try:
+                        os.unlink(entry.path)
+                    except Exception:
+                        pass
     except Exception:
         pass
 
-    # Clear tables in safe order
-    with get_db() as conn:
-        cur = conn.cursor()
-        cur.execute("DELETE FROM vote_items;")
-        cur.execute("DELETE FROM votes;")
-        cur.execute("DELETE FROM entries;")
-        cur.execute("DELETE FROM categories;")
-        cur.execute("DELETE FROM settings;")
+    # Drop the tables rather than DELETE row by row; init_db() recreates them.
+    # Foreign keys are off for this connection so the drops don't turn into
+    # implicit cascading deletes.
+    with closing(_connect()) as conn:
+        conn.executescript(
+            """
+            PRAGMA foreign_keys = OFF;
+            BEGIN;
+            DROP TABLE IF EXISTS vote_items;
+            DROP TABLE IF EXISTS votes;
+            DROP TABLE IF EXISTS entries;
+            DROP TABLE IF EXISTS categories;
+            DROP TABLE IF EXISTS settings;
+            COMMIT;
+            """
+        )
 
-    # Reseed
+    # Reseed, then reclaim the freed pages and re-gather planner stats
     init_db()
+    with closing(_connect()) as conn:
+        conn.execute("VACUUM;")
+        conn.execute("ANALYZE;")
+    _settings_cache.clear()
+    _row_cache.clear()
+    invalidate_storage()
+    invalidate_stats()
     flash("All data purged. Defaults re-seeded and uploads cleared.", "success")
     return to_admin()
 
 
 # ---------------------------- TEMPLATES ---------------------------
 
+# Shared stylesheet, served from /static/app.css so browsers fetch it once
+# instead of with every page.
+APP_CSS = r"""
+:root { --bg:#0e0f12; --card:#16181d; --ink:#eaeef7; --muted:#aab3c5; --accent:#ff8c00; }
+html,body{margin:0;padding:0;background:var(--bg);color:var(--ink);font-family:system-ui,-apple-system,Segoe UI,Roboto,Inter,Arial,sans-serif;}
+a{color:var(--accent);text-decoration:none}
+.container{max-width:1000px;margin:0 auto;padding:24px}
+header{display:flex;gap:16px;align-items:center;justify-content:space-between;margin-bottom:24px}
+.brand{font-weight:700;font-size:1.25rem}
+nav a{margin-right:12px}
+.card{background:var(--card);border-radius:16px;padding:16px;box-shadow:0 10px 24px rgba(0,0,0,.35);}
+.grid{display:grid;gap:16px}
+.grid.cols-2{grid-template-columns:repeat(2,minmax(0,1fr))}
+.grid.cols-3{grid-template-columns:repeat(3,minmax(0,1fr))}
+.btn{display:inline-block;background:var(--accent);color:black;padding:10px 14px;border-radius:10px;font-weight:600;border:none;cursor:pointer}
+.btn.secondary{background:#2a2f39;color:var(--ink)}
+.btn.danger{background:#d84a4a;color:white}
+input,select{
+  width:100%;
+  padding:10px;
+  border-radius:10px;
+  border:1px solid #2b2f3a;
+  background:#0f1115;
+  color:var(--ink);
+  box-sizing:border-box;
+}
+label{font-size:.9rem;color:var(--muted)}
+.muted{color:var(--muted)}
+.text-center{text-align:center}
+.text-lg{font-size:1.15rem}
+.mb-2{margin-bottom:8px}.mb-3{margin-bottom:12px}.mb-4{margin-bottom:16px}.mb-6{margin-bottom:24px}
+img.thumb{width:100%;height:180px;object-fit:cover;border-radius:12px;border:1px solid #2b2f3a;background:#0b0c10}
+.thumb-empty{display:flex;align-items:center;justify-content:center}
+.badge{display:inline-block;padding:4px 10px;border-radius:999px;background:#242833;color:var(--muted);font-size:.8rem}
+.row{display:flex;gap:12px;align-items:center;flex-wrap:wrap}
+.flash{padding:12px;border-radius:10px;margin-bottom:12px}
+.flash.success{background:#1c3b24;color:#c7f7d1}
+.flash.error{background:#3b1c1c;color:#f7c7c7}
+footer{opacity:.7;margin-top:28px;font-size:.9rem}
+
+/* Shared utility classes */
+.progress{height:10px;background:#222;border-radius:999px;overflow:hidden;margin-top:6px}
+.progress > div{height:100%;background:var(--accent)}
+.notice-box{margin:12px 0 18px 0;padding:12px 14px;background:#1b1e25;border:1px solid #2b2f3a;border-radius:12px}
+.category-section{margin:1.0em 0;padding:1em;background:#222;border-radius:12px}
+.entries-grid{display:grid;gap:16px;grid-template-columns:repeat(2,minmax(0,1fr))}
+@media (min-width:1024px){ .entries-grid{grid-template-columns:repeat(3,minmax(0,1fr))} }
+.form-name-grid{display:grid;grid-template-columns:1fr;gap:16px}
+@media (min-width:720px){ .form-name-grid{grid-template-columns:1fr 1fr} }
+"""
+# Comments and indentation dropped once at import; the ETag doubles as the ?v=
+# cache-buster in TPL_BASE, so the URL changes whenever the CSS does.
+APP_CSS_BYTES = " ".join(
+    line.strip() for line in re.sub(r"/\*.*?\*/", "", APP_CSS, flags=re.S).splitlines() if line.strip()
+).encode("utf-8")
+APP_CSS_ETAG = hashlib.sha256(APP_CSS_BYTES).hexdigest()[:16]
+# Precompressed like page_cached's bodies; its own ETag, since a strong
+# validator names one exact byte sequence
+APP_CSS_GZIP = gzip.compress(APP_CSS_BYTES, compresslevel=9, mtime=0)
+
+# Markup shared by several pages. Imported `without context`, so Jinja builds
+# the macro module once and reuses it; anything a macro needs is an argument.
+TPL_MACROS = r"""
+{% macro thumb(path, alt, uploads) %}
+  {% if path %}
+    <img class="thumb" src="{{ uploads ~ path }}" alt="{{ alt }}" />
+  {% else %}
+    <div class="thumb thumb-empty">No Photo</div>
+  {% endif %}
+{% endmacro %}
+
+{% macro entry_card_body(e, uploads) %}
+  {{ thumb(e.photo_path, e.costume_name, uploads) }}
+  <div class="mb-2"><strong>{{ e.costume_name }}</strong></div>
+  <div class="muted">By {{ e.first_name }} {{ e.last_name }}</div>
+{% endmacro %}
+
+{% macro progress_bar(pct) %}
+  <div class="progress"><div style="width:{{ pct }}%"></div></div>
+{% endmacro %}
+"""
+
 TPL_BASE = r"""
 <!doctype html>
 <html lang="en">
@@ -900,75 +1599,27 @@ TPL_BASE = r"""
   <meta charset="utf-8" />
   <meta name="viewport" content="width=device-width, initial-scale=1" />
   <title>{{ page_title }}</title>
-  <style>
-    :root { --bg:#0e0f12; --card:#16181d; --ink:#eaeef7; --muted:#aab3c5; --accent:#ff8c00; }
-    html,body{margin:0;padding:0;background:var(--bg);color:var(--ink);font-family:system-ui,-apple-system,Segoe UI,Roboto,Inter,Arial,sans-serif;}
-    a{color:var(--accent);text-decoration:none}
-    .container{max-width:1000px;margin:0 auto;padding:24px}
-    header{display:flex;gap:16px;align-items:center;justify-content:space-between;margin-bottom:24px}
-    .brand{font-weight:700;font-size:1.25rem}
-    nav a{margin-right:12px}
-    .card{background:var(--card);border-radius:16px;padding:16px;box-shadow:0 10px 24px rgba(0,0,0,.35);}
-    .grid{display:grid;gap:16px}
-    .grid.cols-2{grid-template-columns:repeat(2,minmax(0,1fr))}
-    .grid.cols-3{grid-template-columns:repeat(3,minmax(0,1fr))}
-    .btn{display:inline-block;background:var(--accent);color:black;padding:10px 14px;border-radius:10px;font-weight:600;border:none;cursor:pointer}
-    .btn.secondary{background:#2a2f39;color:var(--ink)}
-    .btn.danger{background:#d84a4a;color:white}
-    input,select{
-      width:100%;
-      padding:10px;
-      border-radius:10px;
-      border:1px solid #2b2f3a;
-      background:#0f1115;
-      color:var(--ink);
-      box-sizing:border-box;
-    }
-    label{font-size:.9rem;color:var(--muted)}
-    .muted{color:var(--muted)}
-    .text-center{text-align:center}
-    .text-lg{font-size:1.15rem}
-    .mb-2{margin-bottom:8px}.mb-3{margin-bottom:12px}.mb-4{margin-bottom:16px}.mb-6{margin-bottom:24px}
-    img.thumb{width:100%;height:180px;object-fit:cover;border-radius:12px;border:1px solid #2b2f3a;background:#0b0c10}
-    .badge{display:inline-block;padding:4px 10px;border-radius:999px;background:#242833;color:var(--muted);font-size:.8rem}
-    .row{display:flex;gap:12px;align-items:center;flex-wrap:wrap}
-    .flash{padding:12px;border-radius:10px;margin-bottom:12px}
-    .flash.success{background:#1c3b24;color:#c7f7d1}
-    .flash.error{background:#3b1c1c;color:#f7c7c7}
-    footer{opacity:.7;margin-top:28px;font-size:.9rem}
-
-    /* Shared utility classes */
-    .progress{height:10px;background:#222;border-radius:999px;overflow:hidden;margin-top:6px}
-    .progress > div{height:100%;background:var(--accent)}
-    .notice-box{margin:12px 0 18px 0;padding:12px 14px;background:#1b1e25;border:1px solid #2b2f3a;border-radius:12px}
-    .category-section{margin:1.0em 0;padding:1em;background:#222;border-radius:12px}
-    .entries-grid{display:grid;gap:16px;grid-template-columns:repeat(2,minmax(0,1fr))}
-    @media (min-width:1024px){ .entries-grid{grid-template-columns:repeat(3,minmax(0,1fr))} }
-  </style>
+  <link rel="stylesheet" href="{{ urls.app_css }}" />
 </head>
 <body>
   <div class="container">
     <header>
       <div class="brand">🎃 {{page_title}}</div>
       <nav>
-        <a href="{{ url_for('home') }}">Home</a>
-        <a href="{{ url_for('entry_form') }}">Submit Costume</a>
-        <a href="{{ url_for('vote_form') }}">Vote</a>
-        <a href="{{ url_for('public_stats') }}">Stats</a>
-        <a href="{{ url_for('admin') }}">Admin</a>
+        <a href="{{ urls.home }}">Home</a>
+        <a href="{{ urls.entry_form }}">Submit Costume</a>
+        <a href="{{ urls.vote_form }}">Vote</a>
+        <a href="{{ urls.public_stats }}">Stats</a>
+        <a href="{{ urls.admin }}">Admin</a>
       </nav>
     </header>
 
-    {% with messages = get_flashed_messages(with_categories=true) %}
-      {% if messages %}
-        {% for category, message in messages %}
-          <div class="flash {{category}}">{{ message }}</div>
-        {% endfor %}
-      {% endif %}
-    {% endwith %}
+    {% for category, message in flashes %}
+      <div class="flash {{category}}">{{ message }}</div>
+    {% endfor %}
 
     <div class="grid">
-      <div class="card">{{ content|safe }}</div>
+      <div class="card">{% block content %}{% endblock %}</div>
     </div>
 
     <footer class="muted">Halloween Voting App - almn.io</footer>
@@ -978,19 +1629,32 @@ TPL_BASE = r"""
 """
 
 TPL_HOME = r"""
+{% extends "base" %}
+{% block content %}
 <h2>Welcome!</h2>
 <p>Use this app to submit your costume and vote for awards during the party.</p>
 <div class="row mb-6">
   <span class="badge">Voting status: <strong>{{ 'OPEN' if voting_enabled else 'CLOSED' }}</strong></span>
-  <a class="btn" href="{{ url_for('entry_form') }}">Submit Costume</a>
-  <a class="btn secondary" href="{{ url_for('vote_form') }}">Go to Voting</a>
-  <a class="btn" href="{{ url_for('public_stats') }}">Stats for Nerds</a>
+  <a class="btn" href="{{ urls.entry_form }}">Submit Costume</a>
+  <a class="btn secondary" href="{{ urls.vote_form }}">Go to Voting</a>
+  <a class="btn" href="{{ urls.public_stats }}">Stats for Nerds</a>
 </div>
+{% endblock %}
+"""
+
+# Single-message pages (voting closed, nothing to vote on)
+TPL_NOTICE = r"""
+{% extends "base" %}
+{% block content %}
+<p class="{{ css_class }}">{{ message }}</p>
+{% endblock %}
 """
 
 TPL_ENTRY_FORM = r"""
+{% extends "base" %}
+{% block content %}
 <h3>Submit Your Costume</h3>
-<form action="{{ url_for('entry_submit') }}" method="post" enctype="multipart/form-data">
+<form action="{{ urls.entry_submit }}" method="post" enctype="multipart/form-data">
   <div class="grid cols-2">
     <div>
       <label>First Name</label>
@@ -1011,16 +1675,19 @@ TPL_ENTRY_FORM = r"""
   </div>
   <button class="btn" type="submit">Submit</button>
 </form>
+{% endblock %}
 """
 
 # Name-only first page (with inline instructions box)
 TPL_VOTE_NAME = r"""
+{% extends "base" %}
+{% from "macros" import progress_bar without context %}
+{% block content %}
 <h3>Cast Your Votes</h3>
 
 <div style="margin: 12px 0;">
   <div class="muted">Step {{ step }} of {{ total }}</div>
-  {% set pct = (step / total * 100)|round(0, 'floor') %}
-  <div class="progress"><div style="width:{{ pct }}%"></div></div>
+  {{ progress_bar(pct) }}
 </div>
 
 <div class="notice-box">
@@ -1028,20 +1695,15 @@ TPL_VOTE_NAME = r"""
   You can go back to change selections before submitting.
 </div>
 
-<style>
-  .form-name-grid{display:grid; grid-template-columns:1fr; gap:16px;}
-  @media (min-width:720px){ .form-name-grid{ grid-template-columns:1fr 1fr; } }
-</style>
-
-<form action="{{ url_for('vote_name_post') }}" method="post">
+<form action="{{ urls.vote_name_post }}" method="post">
   <div class="form-name-grid mb-4">
     <div>
       <label>Your First Name</label>
-      <input name="voter_first" value="{{ voter_first or '' }}" required />
+      <input name="voter_first" value="{{ voter_first }}" required />
     </div>
     <div>
       <label>Your Last Name</label>
-      <input name="voter_last" value="{{ voter_last or '' }}" required />
+      <input name="voter_last" value="{{ voter_last }}" required />
     </div>
   </div>
 
@@ -1049,16 +1711,19 @@ TPL_VOTE_NAME = r"""
     <button class="btn" name="nav" value="next" type="submit">Start Voting →</button>
   </div>
 </form>
+{% endblock %}
 """
 
 # Wizard template: one category per step
 TPL_VOTE_WIZARD = r"""
+{% extends "base" %}
+{% from "macros" import entry_card_body, progress_bar without context %}
+{% block content %}
 <h3>Cast Your Votes</h3>
 
 <div style="margin: 12px 0;">
   <div class="muted">Category {{ step - 1 }} of {{ total - 1 }}</div>
-  {% set pct = (step / total * 100)|round(0, 'floor') %}
-  <div class="progress"><div style="width:{{ pct }}%"></div></div>
+  {{ progress_bar(pct) }}
 </div>
 
 <form action="{{ url_for('vote_step_post', idx=idx) }}" method="post">
@@ -1067,17 +1732,11 @@ TPL_VOTE_WIZARD = r"""
       {{ category.name }}
     </h2>
     <div class="entries-grid">
-      {% for e in entries %}
+      {% for e, is_sel in entries %}
         <label class="card" style="cursor:pointer">
           <input type="radio" name="choice_entry_id" value="{{e.id}}" style="margin-bottom:8px"
-                 {% if ballot.get(category.id|string) == e.id %}checked{% endif %} />
-          {% if e.photo_path %}
-            <img class="thumb" src="{{ url_for('uploaded_file', filename=e.photo_path) }}" alt="{{ e.costume_name }}" />
-          {% else %}
-            <div class="thumb" style="display:flex;align-items:center;justify-content:center">No Photo</div>
-          {% endif %}
-          <div class="mb-2"><strong>{{ e.costume_name }}</strong></div>
-          <div class="muted">By {{ e.first_name }} {{ e.last_name }}</div>
+                 {% if is_sel %}checked{% endif %} />
+          {{ entry_card_body(e, urls.uploads) }}
         </label>
       {% endfor %}
     </div>
@@ -1092,10 +1751,13 @@ TPL_VOTE_WIZARD = r"""
     {% endif %}
   </div>
 </form>
+{% endblock %}
 """
 
 TPL_ADMIN_LOGIN = r"""
-<form action="{{ url_for('admin_login') }}" method="post">
+{% extends "base" %}
+{% block content %}
+<form action="{{ urls.admin_login }}" method="post">
   <div class="mb-3">
     <label>Password</label>
     <input name="password" type="password" required />
@@ -1103,26 +1765,30 @@ TPL_ADMIN_LOGIN = r"""
   <button class="btn" type="submit">Log In</button>
 </form>
 <p class="muted mb-0">Login using administrator credentials.</p>
+{% endblock %}
 """
 
 TPL_ADMIN_DASH = r"""
+{% extends "base" %}
+{% from "macros" import entry_card_body without context %}
+{% block content %}
 <div class="row mb-4">
-  <form action="{{ url_for('toggle_voting') }}" method="post">
+  <form action="{{ urls.toggle_voting }}" method="post">
     <button class="btn" type="submit">{{ 'Disable' if voting_enabled else 'Enable' }} Voting</button>
   </form>
-  <form action="{{ url_for('admin_logout') }}" method="post">
+  <form action="{{ urls.admin_logout }}" method="post">
     <button class="btn secondary" type="submit">Log Out</button>
   </form>
-  <a class="btn secondary" href="{{ url_for('admin_results') }}">View Results</a>
-  <a class="btn" href="{{ url_for('admin_audit') }}">Audit: Who Voted</a>
-  <a class="btn" href="{{ url_for('public_stats') }}">Stats</a>
-  <form action="{{ url_for('admin_purge') }}" method="post" onsubmit="return confirm('Purge ALL data (entries, votes, categories) and delete uploaded photos? This cannot be undone.');">
+  <a class="btn secondary" href="{{ urls.admin_results }}">View Results</a>
+  <a class="btn" href="{{ urls.admin_audit }}">Audit: Who Voted</a>
+  <a class="btn" href="{{ urls.public_stats }}">Stats</a>
+  <form action="{{ urls.admin_purge }}" method="post" onsubmit="return confirm('Purge ALL data (entries, votes, categories) and delete uploaded photos? This cannot be undone.');">
     <button class="btn danger" type="submit">Purge All Data</button>
   </form>
 </div>
 
 <h3>Categories</h3>
-<form class="mb-3" action="{{ url_for('category_add') }}" method="post">
+<form class="mb-3" action="{{ urls.category_add }}" method="post">
   <div class="row">
     <input name="name" placeholder="Add new category" required />
     <button class="btn" type="submit">Add</button>
@@ -1155,98 +1821,90 @@ TPL_ADMIN_DASH = r"""
 <div class="grid cols-3">
   {% for e in entries %}
     <div class="card">
-      {% if e.photo_path %}
-        <img class="thumb" src="{{ url_for('uploaded_file', filename=e.photo_path) }}" alt="{{ e.costume_name }}" />
-      {% else %}
-        <div class="thumb" style="display:flex;align-items:center;justify-content:center">No Photo</div>
-      {% endif %}
-      <div class="mb-2"><strong>{{ e.costume_name }}</strong></div>
-      <div class="muted">By {{ e.first_name }} {{ e.last_name }}</div>
+      {{ entry_card_body(e, urls.uploads) }}
       <form class="mt-2" action="{{ url_for('entry_delete', entry_id=e.id) }}" method="post" onsubmit="return confirm('Delete this entry?')">
         <button class="btn danger" type="submit">Delete</button>
       </form>
     </div>
   {% endfor %}
 </div>
+{% endblock %}
 """
 
 TPL_RESULTS = r"""
+{% extends "base" %}
+{% block content %}
 <h3>Live Results</h3>
-{% for cat_name, rows in tallies.items() %}
+{% for cat_name, rows_html in tallies.items() %}
   <div class="card mb-3">
     <h4>{{ cat_name }}</h4>
-    {% if not rows %}
+    {% if not rows_html %}
       <p class="muted">No entries.</p>
     {% else %}
+      <div>{{ rows_html }}</div>
+    {% endif %}
+  </div>
+{% endfor %}
+{% endblock %}
+"""
+# One category's standings; rendered via _results_rows_html() and cached there
+TPL_RESULTS_ROWS = r"""
+{% for r in rows %}
+  <div class="row" style="justify-content:space-between;align-items:center;border-bottom:1px solid #262a34;padding:10px 0">
+    <div class="row" style="gap:10px;align-items:center">
+      {% if r.photo_path %}
+        <img src="{{ urls.uploads ~ r.photo_path }}" alt="{{ r.costume_name }}" style="width:56px;height:56px;object-fit:cover;border-radius:8px;border:1px solid #2b2f3a" />
+      {% endif %}
       <div>
-        {% for r in rows %}
-          <div class="row" style="justify-content:space-between;align-items:center;border-bottom:1px solid #262a34;padding:10px 0">
-            <div class="row" style="gap:10px;align-items:center">
-              {% if r.photo_path %}
-                <img src="{{ url_for('uploaded_file', filename=r.photo_path) }}" alt="{{ r.costume_name }}" style="width:56px;height:56px;object-fit:cover;border-radius:8px;border:1px solid #2b2f3a" />
-              {% endif %}
-              <div>
-                <div><strong>{{ r.costume_name }}</strong></div>
-                <div class="muted">by {{ r.first_name }} {{ r.last_name }}</div>
-              </div>
-            </div>
-            <div><span class="badge">{{ r.votes }} vote{{ '' if r.votes == 1 else 's' }}</span></div>
-          </div>
-        {% endfor %}
+        <div><strong>{{ r.costume_name }}</strong></div>
+        <div class="muted">by {{ r.first_name }} {{ r.last_name }}</div>
       </div>
-    {% endif %}
+    </div>
+    <div><span class="badge">{{ r.votes }} vote{{ '' if r.votes == 1 else 's' }}</span></div>
   </div>
 {% endfor %}
 """
 
 TPL_ADMIN_AUDIT = r"""
+{% extends "base" %}
+{% block content %}
 <h3>Audit — Who Voted For What</h3>
 <div class="row mb-4">
-  <a class="btn secondary" href="{{ url_for('admin') }}">← Back to Admin</a>
-  <a class="btn" href="{{ url_for('admin_audit_csv') }}">Download CSV</a>
+  <a class="btn secondary" href="{{ urls.admin }}">← Back to Admin</a>
+  <a class="btn" href="{{ urls.admin_audit_csv }}">Download CSV</a>
 </div>
 
-{% if not rows %}
-  <p class="muted">No ballots have been submitted yet.</p>
-{% else %}
-  {% set current_vote = None %}
-  {% for r in rows %}
-    {% if current_vote != r.vote_id %}
-      {% if not loop.first %}
-        </div>
-      </div>
-      {% endif %}
-
-      <div class="card mb-3">
-        <div class="row" style="justify-content:space-between; align-items:center;">
-          <div><strong>Voter:</strong> {{ r.voter_first }} {{ r.voter_last }}</div>
-          <div class="muted">Ballot ID {{ r.vote_id }} • {{ r.voted_at }}</div>
-        </div>
-        <div style="margin-top:10px;">
-      {% set current_vote = r.vote_id %}
-    {% endif %}
-
-    <div class="row" style="justify-content:space-between; align-items:center; border-bottom:1px solid #262a34; padding:8px 0;">
-      <div class="muted">{{ r.category_name }}</div>
-      <div>
-        <strong>{{ r.costume_name }}</strong>
-        <span class="muted">by {{ r.entry_first }} {{ r.entry_last }}</span>
-      </div>
+{% for b, items in ballots %}
+  <div class="card mb-3">
+    <div class="row" style="justify-content:space-between; align-items:center;">
+      <div><strong>Voter:</strong> {{ b.voter_first }} {{ b.voter_last }}</div>
+      <div class="muted">Ballot ID {{ b.vote_id }} • {{ b.voted_at }}</div>
     </div>
-
-    {% if loop.last %}
+    <div style="margin-top:10px;">
+      {% for r in items %}
+        <div class="row" style="justify-content:space-between; align-items:center; border-bottom:1px solid #262a34; padding:8px 0;">
+          <div class="muted">{{ r.category_name }}</div>
+          <div>
+            <strong>{{ r.costume_name }}</strong>
+            <span class="muted">by {{ r.entry_first }} {{ r.entry_last }}</span>
+          </div>
         </div>
-      </div>
-    {% endif %}
-  {% endfor %}
-{% endif %}
+      {% endfor %}
+    </div>
+  </div>
+{% else %}
+  <p class="muted">No ballots have been submitted yet.</p>
+{% endfor %}
+{% endblock %}
 """
 
 # Reuse this template for public /stats
 TPL_ADMIN_STATS = r"""
+{% extends "base" %}
+{% block content %}
 <h3>Stats for Nerds</h3>
 <div class="row mb-4">
-  <a class="btn" href="{{ url_for('public_stats_json') }}">View JSON</a>
+  <a class="btn" href="{{ urls.public_stats_json }}">View JSON</a>
 </div>
 
 <div class="grid cols-3 mb-6">
@@ -1262,16 +1920,10 @@ TPL_ADMIN_STATS = r"""
     <div class="mb-2">{{ d.expected_attendees or 'Unknown' }}</div>
 
     <div class="muted">Progress</div>
-    <div class="mb-2">
-      {% if d.progress_pct is not none %}
-        <span class="badge">{{ d.progress_pct }}%</span>
-      {% else %}
-        <span class="badge">n/a</span>
-      {% endif %}
-    </div>
+    <div class="mb-2"><span class="badge">{{ progress }}</span></div>
 
     <div class="muted">Uptime</div>
-    <div>{{ (d.uptime_seconds // 3600) }}h {{ (d.uptime_seconds // 60) % 60 }}m</div>
+    <div>{{ uptime }}</div>
   </div>
 
   <div class="card">
@@ -1316,40 +1968,121 @@ TPL_ADMIN_STATS = r"""
 </div>
 
 <h4>Timeline (UTC)</h4>
-<div class="grid cols-2">
-  <div class="card">
-    <strong>Entries per hour</strong>
-    {% if not d.timeline.entries_hourly %}
-      <div class="muted">No data</div>
-    {% else %}
-      <div>
-        {% for r in d.timeline.entries_hourly %}
-          <div class="row" style="justify-content:space-between;border-bottom:1px solid #262a34;padding:6px 0;">
-            <div class="muted">{{ r.hour }}:00</div>
-            <div class="badge">{{ r.count }}</div>
-          </div>
-        {% endfor %}
-      </div>
-    {% endif %}
-  </div>
-
-  <div class="card">
-    <strong>Votes per hour</strong>
-    {% if not d.timeline.votes_hourly %}
-      <div class="muted">No data</div>
-    {% else %}
-      <div>
-        {% for r in d.timeline.votes_hourly %}
-          <div class="row" style="justify-content:space-between;border-bottom:1px solid #262a34;padding:6px 0;">
-            <div class="muted">{{ r.hour }}:00</div>
-            <div class="badge">{{ r.count }}</div>
-          </div>
-        {% endfor %}
+<div class="card">
+  {% if not hourly %}
+    <div class="muted">No data</div>
+  {% else %}
+    <div class="row" style="justify-content:space-between;border-bottom:1px solid #262a34;padding:6px 0;">
+      <strong style="flex:1">Hour</strong><strong style="flex:1">Entries</strong><strong style="flex:1">Votes</strong>
+    </div>
+    {% for hour, entries, votes in hourly %}
+      <div class="row" style="justify-content:space-between;border-bottom:1px solid #262a34;padding:6px 0;">
+        <div class="muted" style="flex:1">{{ hour }}:00</div>
+        <div style="flex:1"><span class="badge">{{ entries }}</span></div>
+        <div style="flex:1"><span class="badge">{{ votes }}</span></div>
       </div>
-    {% endif %}
-  </div>
+    {% endfor %}
+  {% endif %}
 </div>
+{% endblock %}
 """
 
+# Templates are looked up by name so children can {% extends "base" %}. The
+# overlay shares Flask's globals (url_for) and caches each compiled template
+# for the life of the process.
+TEMPLATES = {
+    "base": TPL_BASE,
+    "macros": TPL_MACROS,
+    "home": TPL_HOME,
+    "notice": TPL_NOTICE,
+    "entry_form": TPL_ENTRY_FORM,
+    "vote_name": TPL_VOTE_NAME,
+    "vote_wizard": TPL_VOTE_WIZARD,
+    "admin_login": TPL_ADMIN_LOGIN,
+    "admin_dash": TPL_ADMIN_DASH,
+    "results": TPL_RESULTS,
+    "results_rows": TPL_RESULTS_ROWS,
+    "admin_audit": TPL_ADMIN_AUDIT,
+    "admin_stats": TPL_ADMIN_STATS,
+}
+
+
+def _blank_none(value):
+    # {{ x }} with x None prints nothing rather than "None"; no `or ''` needed
+    return "" if value is None else value
+
+
+# Names carry no .html suffix, so autoescape is forced on rather than left to
+# Flask's filename check. The sources are string constants that can't change
+# under a running process, so there's nothing to re-check (auto_reload) and
+# nothing to evict (cache_size); trim/lstrip_blocks keep the indentation
+# around {% %} tags out of the output.
+ENV_OPTIONS = dict(
+    autoescape=True,
+    auto_reload=False,
+    cache_size=-1,
+    trim_blocks=True,
+    lstrip_blocks=True,
+    finalize=_blank_none,
+)
+# A fresh worker still compiles every template once; the on-disk bytecode cache
+# turns that into unmarshalling. Each bucket records its source checksum, so an
+# edited template just recompiles. The compiled code also depends on the
+# options above and on the Jinja release (the bucket magic only tracks its
+# bytecode format and the Python version), so those go in the file name.
+# Cache files are unmarshalled as code, so the dir must be ours and private
+# (Jinja checks the same for its default dir). Unwritable or unsafe dir:
+# compile in memory as before.
+_opts_tag = hashlib.sha256(
+    repr((
+        importlib.metadata.version("jinja2"),
+        sorted((k, getattr(v, "__name__", v)) for k, v in ENV_OPTIONS.items()),
+    )).encode()
+).hexdigest()[:8]
+
+
+def _bytecode_cache() -> Optional[FileSystemBytecodeCache]:
+    pattern = f"%s.{_opts_tag}.cache"
+    try:
+        if JINJA_BCC_DIR is None:
+            return FileSystemBytecodeCache(pattern=pattern)
+        os.makedirs(JINJA_BCC_DIR, mode=0o700, exist_ok=True)
+        st = os.lstat(JINJA_BCC_DIR)
+    except (OSError, RuntimeError):
+        return None
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or st.st_mode & 0o077:
+        app.logger.warning("JINJA_BCC_DIR %s is not a private directory; not caching bytecode", JINJA_BCC_DIR)
+        return None
+    return FileSystemBytecodeCache(JINJA_BCC_DIR, pattern)
+
+
+_bcc = _bytecode_cache()
+ENV = app.jinja_env.overlay(loader=DictLoader(TEMPLATES), bytecode_cache=_bcc, **ENV_OPTIONS)
+# Compile everything at import so the first request after a worker boots
+# doesn't pay for lexing/parsing/codegen, and a template syntax error fails
+# the deploy instead of a page.
+for _name in TEMPLATES:
+    ENV.get_template(_name)
+
 if __name__ == "__main__":
-    app.run(debug=True, host="0.0.0.0", port=int(os.environ.get("PORT", 5000)))
\ No newline at end of file
+    port = int(os.environ.get("PORT", 5000))
+    if os.environ.get("FLASK_DEBUG") != "1" and shutil.which("gunicorn"):
+        # Replace this process with gunicorn: several workers x threads instead of
+        # the dev server handling one request at a time.
+        # Workers import the app separately; without this each would sign
+        # sessions with its own random key.
+        os.environ.setdefault("FLASK_SECRET", app.secret_key)
+        os.execvp(
+            "gunicorn",
+            [
+                "gunicorn",
+                "-w", "4",
+                "-k", "gthread",
+                "--threads", "8",
+                "-b", f"0.0.0.0:{port}",
+                "--pythonpath", str(Path(__file__).resolve().parent),
+                "halloween_voting_app:app",
+            ],
+        )
+    # No gunicorn: the dev server, with the debugger/reloader only when asked for
+    app.run(debug=os.environ.get("FLASK_DEBUG") == "1", host="0.0.0.0", port=port)
\ No newline at end of file